@@ -4,8 +4,12 @@ Main Flask application for testing prompts against multiple LLM models.
 """
 
 import os
-from flask import Flask, render_template, request, redirect, url_for
+import threading
+from datetime import datetime
+from flask import Flask, render_template, request, redirect, url_for, flash, abort
 from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
 
 # Load environment variables
 load_dotenv()
@@ -23,7 +27,17 @@ os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ECHO'] = False
+# Keep a small pool of warm connections so requests reuse the page cache and mmap
+# instead of reopening the database (and its -wal/-shm files) every time
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'poolclass': QueuePool,
+    'pool_size': 5,
+    'max_overflow': 5,
+    'connect_args': {'check_same_thread': False, 'timeout': 30}
+}
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+app.config['UNAVAILABLE_MODELS'] = []
 
 # Import db and initialize with app
 from models.database import db, TestSession, PromptVersion, TestResult, Configuration
@@ -34,45 +48,156 @@ from models.config import (
     validate_models_against_openrouter,
     mask_api_key
 )
+from models.test_runner import run_tests_concurrent
 
 db.init_app(app)
 
+# SQLite tuning applied to every new connection: WAL lets readers run alongside
+# the writer and turns each commit into a single WAL append
+SQLITE_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-64000;
+    PRAGMA busy_timeout=5000;
+"""
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply performance PRAGMAs to a freshly opened SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.executescript(SQLITE_PRAGMAS)
+
+        # journal_mode silently stays unchanged on some filesystems
+        journal_mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+        if journal_mode.lower() != 'wal':
+            app.logger.warning(f"SQLite WAL mode not enabled (journal_mode={journal_mode})")
+    finally:
+        cursor.close()
+
+
+# How often to refresh SQLite's query planner statistics (seconds)
+OPTIMIZE_INTERVAL = 60 * 60
+
+
+def optimize_database():
+    """Run PRAGMA optimize, then schedule the next run on a background timer"""
+    try:
+        with app.app_context(), db.engine.connect() as connection:
+            connection.exec_driver_sql('PRAGMA optimize')
+    except Exception as e:
+        app.logger.warning(f"PRAGMA optimize failed: {str(e)}")
+
+    timer = threading.Timer(OPTIMIZE_INTERVAL, optimize_database)
+    timer.daemon = True
+    timer.start()
+
+
+# OpenRouter's model list is cached next to the database between restarts
+OPENROUTER_MODELS_CACHE_PATH = os.path.join(os.path.dirname(db_path), 'openrouter_models.cache.json')
+
+
+def validate_configured_models(openrouter_key, configured_models):
+    """Check configured models against OpenRouter and record the unavailable ones"""
+    unavailable_models, error = validate_models_against_openrouter(
+        openrouter_key,
+        configured_models,
+        cache_path=OPENROUTER_MODELS_CACHE_PATH
+    )
+
+    if error:
+        app.logger.warning(f"OpenRouter validation failed: {error}")
+        return
+
+    app.config['UNAVAILABLE_MODELS'] = unavailable_models
+
+    if unavailable_models:
+        app.logger.warning(
+            f"The following configured models are not available on OpenRouter: "
+            f"{', '.join(unavailable_models)}"
+        )
+    else:
+        app.logger.info("All configured models validated successfully against OpenRouter")
+
+
+def repair_duplicate_current_versions():
+    """Keep only the newest current prompt version per session so ix_pv_one_current can be created"""
+    with db.engine.begin() as connection:
+        session_ids = connection.exec_driver_sql(
+            'SELECT session_id FROM prompt_versions WHERE is_current_version = 1 '
+            'GROUP BY session_id HAVING COUNT(*) > 1'
+        ).scalars().all()
+        if not session_ids:
+            return
+
+        connection.exec_driver_sql(
+            'UPDATE prompt_versions SET is_current_version = 0 '
+            'WHERE is_current_version = 1 AND id != ('
+            '    SELECT newest.id FROM prompt_versions AS newest '
+            '    WHERE newest.session_id = prompt_versions.session_id '
+            '    AND newest.is_current_version = 1 '
+            '    ORDER BY newest.created_at DESC, newest.id DESC LIMIT 1'
+            ')'
+        )
+
+    app.logger.warning(
+        f"Sessions had more than one current prompt version; kept the newest for: "
+        f"{', '.join(str(session_id) for session_id in session_ids)}"
+    )
+
+
 # Create database tables if they don't exist
 with app.app_context():
+    event.listen(db.engine, 'connect', set_sqlite_pragmas)
+
     db.create_all()
 
+    # create_all() skips tables that already exist, so add any indexes that
+    # were introduced after the database was first created
+    repair_duplicate_current_versions()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+    optimize_database()
+
     # Load and validate model configuration
     try:
-        configured_models = load_models_config()
+        # Freeze the model list once and index it by ID for per-request lookups
+        configured_models = tuple(load_models_config())
         app.config['CONFIGURED_MODELS'] = configured_models
+        app.config['CONFIGURED_MODELS_BY_ID'] = {model['id']: model for model in configured_models}
         app.logger.info(f"Loaded {len(configured_models)} models from configuration")
 
-        # Validate models against OpenRouter if API key is available
+        # Validate models against OpenRouter in the background so startup never
+        # waits on the network
         openrouter_key = get_api_key('openrouter')
         if openrouter_key:
-            unavailable_models, error = validate_models_against_openrouter(
-                openrouter_key,
-                configured_models
-            )
-
-            if error:
-                app.logger.warning(f"OpenRouter validation failed: {error}")
-            elif unavailable_models:
-                app.logger.warning(
-                    f"The following configured models are not available on OpenRouter: "
-                    f"{', '.join(unavailable_models)}"
-                )
-            else:
-                app.logger.info("All configured models validated successfully against OpenRouter")
+            threading.Thread(
+                target=validate_configured_models,
+                args=(openrouter_key, configured_models),
+                daemon=True
+            ).start()
         else:
             app.logger.info("OpenRouter API key not configured - skipping model validation")
 
     except FileNotFoundError:
         app.logger.error("models.yaml configuration file not found")
-        app.config['CONFIGURED_MODELS'] = []
+        app.config['CONFIGURED_MODELS'] = ()
+        app.config['CONFIGURED_MODELS_BY_ID'] = {}
     except Exception as e:
         app.logger.error(f"Failed to load model configuration: {str(e)}")
-        app.config['CONFIGURED_MODELS'] = []
+        app.config['CONFIGURED_MODELS'] = ()
+        app.config['CONFIGURED_MODELS_BY_ID'] = {}
+
+
+def ensure_session_exists(session_id):
+    """Abort with 404 unless the session exists, without loading the session row"""
+    if db.session.query(TestSession.id).filter_by(id=session_id).scalar() is None:
+        abort(404)
+
 
 # Root route - redirect to sessions
 @app.route('/')
@@ -84,30 +209,44 @@ def index():
 @app.route('/sessions')
 def sessions():
     """Display list of all test sessions"""
-    # Query all sessions ordered by most recent first
-    all_sessions = TestSession.query.order_by(TestSession.created_at.desc()).all()
-
-    # Add version count and test statistics to each session
-    sessions_with_counts = []
-    for session in all_sessions:
-        # Get all test results for this session
-        test_results = TestResult.query\
-            .join(PromptVersion, TestResult.version_id == PromptVersion.id)\
-            .filter(PromptVersion.session_id == session.id)\
-            .all()
-
-        # Calculate statistics
-        total_tests = len(test_results)
-        successful_tests = sum(1 for result in test_results if result.overall_success)
-
-        sessions_with_counts.append({
-            'id': session.id,
-            'title': session.title,
-            'created_at': session.created_at,
-            'version_count': len(session.prompt_versions),
+    # Version counts per session, aggregated in SQL rather than loading every version
+    version_counts = db.session.query(
+        PromptVersion.session_id,
+        db.func.count(PromptVersion.id).label('version_count')
+    ).group_by(PromptVersion.session_id).subquery()
+
+    # Test totals and successes per session across all of its versions
+    test_counts = db.session.query(
+        PromptVersion.session_id,
+        db.func.count(TestResult.id).label('total_tests'),
+        db.func.sum(db.case((TestResult.overall_success, 1), else_=0)).label('successful_tests')
+    ).join(TestResult, TestResult.version_id == PromptVersion.id)\
+        .group_by(PromptVersion.session_id).subquery()
+
+    # Query all sessions with their counts, ordered by most recent first
+    rows = db.session.query(
+        TestSession.id,
+        TestSession.title,
+        TestSession.created_at,
+        db.func.coalesce(version_counts.c.version_count, 0),
+        db.func.coalesce(test_counts.c.total_tests, 0),
+        db.func.coalesce(test_counts.c.successful_tests, 0)
+    ).outerjoin(version_counts, version_counts.c.session_id == TestSession.id)\
+        .outerjoin(test_counts, test_counts.c.session_id == TestSession.id)\
+        .order_by(TestSession.created_at.desc())\
+        .all()
+
+    sessions_with_counts = [
+        {
+            'id': session_id,
+            'title': title,
+            'created_at': created_at,
+            'version_count': version_count,
             'total_tests': total_tests,
             'successful_tests': successful_tests
-        })
+        }
+        for session_id, title, created_at, version_count, total_tests, successful_tests in rows
+    ]
 
     return render_template('sessions.html', sessions=sessions_with_counts)
 
@@ -133,7 +272,7 @@ def create_session():
     db.session.commit()
 
     # Redirect to session detail page
-    return redirect(url_for('session_detail', session_id=new_session.id))
+    return redirect(url_for('session_detail', session_id=new_session.id), code=303)
 
 
 # Session detail route
@@ -154,18 +293,15 @@ def session_detail(session_id):
     current_prompt = current_version.prompt_text if current_version else None
     current_reference = current_version.reference_text if current_version else None
 
-    # Get success/error messages from query params (for redirects)
-    success_message = request.args.get('success')
-    error_message = request.args.get('error')
-
     # Get configured models for test execution UI
-    configured_models = app.config.get('CONFIGURED_MODELS', [])
+    configured_models = app.config['CONFIGURED_MODELS']
 
-    # Check if any test results exist for this session
-    has_results = TestResult.query\
-        .join(PromptVersion, TestResult.version_id == PromptVersion.id)\
-        .filter(PromptVersion.session_id == session_id)\
-        .first() is not None
+    # Check if any test results exist for this session with an EXISTS probe on the
+    # version_id index, rather than loading a full result row (and its response text)
+    version_ids = [v.id for v in versions]
+    has_results = bool(version_ids) and db.session.query(
+        TestResult.query.filter(TestResult.version_id.in_(version_ids)).exists()
+    ).scalar()
 
     return render_template(
         'session_detail.html',
@@ -173,8 +309,6 @@ def session_detail(session_id):
         versions=versions,
         current_prompt=current_prompt,
         current_reference=current_reference,
-        success_message=success_message,
-        error_message=error_message,
         models=configured_models,
         has_results=has_results
     )
@@ -185,7 +319,7 @@ def session_detail(session_id):
 def save_version(session_id):
     """Save a new prompt version for this session"""
     # Verify session exists
-    session = TestSession.query.get_or_404(session_id)
+    ensure_session_exists(session_id)
 
     # Get form data
     prompt_text = request.form.get('prompt_text', '').strip()
@@ -194,13 +328,17 @@ def save_version(session_id):
 
     # Validate required field
     if not prompt_text:
-        return redirect(url_for('session_detail',
-                                session_id=session_id,
-                                error='Prompt text is required'))
-
-    # Set all existing versions to not current
-    PromptVersion.query.filter_by(session_id=session_id)\
-        .update({'is_current_version': False})
+        flash('Prompt text is required', 'error')
+        return redirect(url_for('session_detail', session_id=session_id), code=303)
+
+    # Unset the previous current version, skipping the UPDATE entirely for the
+    # first version of a new session
+    previous_current_id = db.session.query(PromptVersion.id)\
+        .filter_by(session_id=session_id, is_current_version=True)\
+        .scalar()
+    if previous_current_id is not None:
+        PromptVersion.query.filter_by(id=previous_current_id)\
+            .update({'is_current_version': False}, synchronize_session=False)
 
     # Create new version as current
     new_version = PromptVersion(
@@ -213,9 +351,8 @@ def save_version(session_id):
     db.session.add(new_version)
     db.session.commit()
 
-    return redirect(url_for('session_detail',
-                            session_id=session_id,
-                            success='New version saved successfully'))
+    flash('New version saved successfully', 'success')
+    return redirect(url_for('session_detail', session_id=session_id), code=303)
 
 
 # Rollback to previous version route
@@ -223,42 +360,49 @@ def save_version(session_id):
 def rollback_version(session_id, version_id):
     """Rollback to a previous version by creating a new version with the old content"""
     # Verify session exists
-    session = TestSession.query.get_or_404(session_id)
-
-    # Get the old version to rollback to
-    old_version = PromptVersion.query.filter_by(
-        id=version_id,
-        session_id=session_id
-    ).first_or_404()
+    ensure_session_exists(session_id)
+
+    # Unset the current version, then copy the old version's content into a new
+    # current version with INSERT ... SELECT so no rows are loaded into Python
+    db.session.execute(
+        db.text(
+            "UPDATE prompt_versions SET is_current_version = 0 "
+            "WHERE session_id = :session_id AND is_current_version = 1"
+        ),
+        {'session_id': session_id}
+    )
+    inserted = db.session.execute(
+        db.text(
+            "INSERT INTO prompt_versions "
+            "(session_id, prompt_text, reference_text, notes, is_current_version, created_at) "
+            "SELECT session_id, prompt_text, reference_text, :notes, 1, :created_at "
+            "FROM prompt_versions WHERE id = :version_id AND session_id = :session_id"
+        ).bindparams(db.bindparam('created_at', type_=db.DateTime)),
+        {
+            'session_id': session_id,
+            'version_id': version_id,
+            'notes': f"Rolled back from version #{version_id}",
+            'created_at': datetime.utcnow()
+        }
+    )
 
-    # Set all existing versions to not current
-    PromptVersion.query.filter_by(session_id=session_id)\
-        .update({'is_current_version': False})
+    # The old version doesn't exist in this session
+    if inserted.rowcount == 0:
+        db.session.rollback()
+        abort(404)
 
-    # Create new version with old content
-    rollback_version = PromptVersion(
-        session_id=session_id,
-        prompt_text=old_version.prompt_text,
-        reference_text=old_version.reference_text,
-        notes=f"Rolled back from version #{version_id}",
-        is_current_version=True
-    )
-    db.session.add(rollback_version)
     db.session.commit()
 
-    return redirect(url_for('session_detail',
-                            session_id=session_id,
-                            success=f'Rolled back to version #{version_id}'))
+    flash(f'Rolled back to version #{version_id}', 'success')
+    return redirect(url_for('session_detail', session_id=session_id), code=303)
 
 
 # Run tests route
 @app.route('/sessions/<int:session_id>/run-tests', methods=['POST'])
 def run_tests(session_id):
     """Run tests against selected models using the current prompt version"""
-    from models.test_runner import run_tests_sequential
-
     # Verify session exists
-    session = TestSession.query.get_or_404(session_id)
+    ensure_session_exists(session_id)
 
     # Get form data
     model_ids = request.form.getlist('model_ids')
@@ -266,15 +410,13 @@ def run_tests(session_id):
 
     # Validate model selection
     if not model_ids:
-        return redirect(url_for('session_detail',
-                                session_id=session_id,
-                                error='Please select at least one model to test'))
+        flash('Please select at least one model to test', 'error')
+        return redirect(url_for('session_detail', session_id=session_id), code=303)
 
     # Validate temperature
     if temperature is None or temperature < 0 or temperature > 2:
-        return redirect(url_for('session_detail',
-                                session_id=session_id,
-                                error='Temperature must be between 0 and 2'))
+        flash('Temperature must be between 0 and 2', 'error')
+        return redirect(url_for('session_detail', session_id=session_id), code=303)
 
     # Get current version
     current_version = PromptVersion.query.filter_by(
@@ -283,20 +425,18 @@ def run_tests(session_id):
     ).first()
 
     if not current_version:
-        return redirect(url_for('session_detail',
-                                session_id=session_id,
-                                error='Please save a prompt version before running tests'))
+        flash('Please save a prompt version before running tests', 'error')
+        return redirect(url_for('session_detail', session_id=session_id), code=303)
 
     # Get OpenRouter API key
     openrouter_key = get_api_key('openrouter')
     if not openrouter_key:
-        return redirect(url_for('session_detail',
-                                session_id=session_id,
-                                error='Please configure OpenRouter API key in settings'))
+        flash('Please configure OpenRouter API key in settings', 'error')
+        return redirect(url_for('session_detail', session_id=session_id), code=303)
 
-    # Run tests sequentially
+    # Run tests concurrently (rate limited)
     try:
-        result_ids = run_tests_sequential(
+        result_ids = run_tests_concurrent(
             version_id=current_version.id,
             model_ids=model_ids,
             temperature=temperature,
@@ -308,15 +448,13 @@ def run_tests(session_id):
         model_count = len(result_ids)
         success_msg = f'Tests completed. {model_count} model{"s" if model_count != 1 else ""} tested.'
 
-        return redirect(url_for('session_detail',
-                                session_id=session_id,
-                                success=success_msg))
+        flash(success_msg, 'success')
+        return redirect(url_for('session_detail', session_id=session_id), code=303)
 
     except Exception as e:
         app.logger.error(f"Error running tests: {str(e)}")
-        return redirect(url_for('session_detail',
-                                session_id=session_id,
-                                error=f'Error running tests: {str(e)}'))
+        flash(f'Error running tests: {str(e)}', 'error')
+        return redirect(url_for('session_detail', session_id=session_id), code=303)
 
 
 # Results display route
@@ -388,16 +526,12 @@ def settings():
             except Exception as e:
                 error_message = f"Failed to save API keys: {str(e)}"
 
-    # Retrieve existing API keys (masked for display)
-    openrouter_key = get_api_key('openrouter')
-    odin_key = get_api_key('0din_ai')
-
-    # Mask keys for display
-    masked_openrouter = mask_api_key(openrouter_key) if openrouter_key else None
-    masked_odin = mask_api_key(odin_key) if odin_key else None
+    # Retrieve existing API keys, masked for display
+    masked_openrouter = mask_api_key(get_api_key('openrouter'))
+    masked_odin = mask_api_key(get_api_key('0din_ai'))
 
     # Get configured models for display
-    configured_models = app.config.get('CONFIGURED_MODELS', [])
+    configured_models = app.config['CONFIGURED_MODELS']
 
     return render_template(
         'settings.html',
@@ -424,11 +558,7 @@ def submit_form(result_id):
     session = version.session
 
     # Find the model configuration that matches this result
-    configured_models = app.config.get('CONFIGURED_MODELS', [])
-    model_config = next(
-        (m for m in configured_models if m['id'] == result.model_id),
-        None
-    )
+    model_config = app.config['CONFIGURED_MODELS_BY_ID'].get(result.model_id)
 
     if not model_config:
         # Fallback if model not in config
@@ -438,17 +568,13 @@ def submit_form(result_id):
         model_name = model_config['display_name']
         model_vendor = model_config['vendor']
 
-    # Get error message from query params if any
-    error_message = request.args.get('error')
-
     return render_template(
         'submit_form.html',
         result=result,
         session=session,
         model_name=model_name,
         model_vendor=model_vendor,
-        security_boundaries=SECURITY_BOUNDARIES,
-        error_message=error_message
+        security_boundaries=SECURITY_BOUNDARIES
     )
 
 
@@ -473,22 +599,16 @@ def generate_submission(result_id):
 
     # Validate required fields
     if not all([title, summary, security_boundary, severity]):
-        return redirect(url_for('submit_form',
-                                result_id=result_id,
-                                error='All fields are required'))
+        flash('All fields are required', 'error')
+        return redirect(url_for('submit_form', result_id=result_id), code=303)
 
     # Validate severity
     if severity not in ['low', 'medium', 'high', 'severe']:
-        return redirect(url_for('submit_form',
-                                result_id=result_id,
-                                error='Invalid severity level'))
+        flash('Invalid severity level', 'error')
+        return redirect(url_for('submit_form', result_id=result_id), code=303)
 
     # Find the model configuration
-    configured_models = app.config.get('CONFIGURED_MODELS', [])
-    model_config = next(
-        (m for m in configured_models if m['id'] == result.model_id),
-        None
-    )
+    model_config = app.config['CONFIGURED_MODELS_BY_ID'].get(result.model_id)
 
     if not model_config:
         # Create fallback model config
@@ -529,11 +649,12 @@ def generate_submission(result_id):
 
     except Exception as e:
         app.logger.error(f"Error generating submission: {str(e)}")
-        return redirect(url_for('submit_form',
-                                result_id=result_id,
-                                error=f'Error generating submission: {str(e)}'))
+        flash(f'Error generating submission: {str(e)}', 'error')
+        return redirect(url_for('submit_form', result_id=result_id), code=303)
 
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
-    app.run(host='127.0.0.1', port=port, debug=True)
+    # Debug mode (and its reloader, which imports the app twice) is opt-in
+    debug = os.getenv('FLASK_DEBUG', 'False').lower() in ('1', 'true')
+    app.run(host='127.0.0.1', port=port, debug=debug, use_reloader=debug)
@@ -4,16 +4,45 @@ Handles loading model configuration from YAML and managing API keys in the datab
 """
 
 import os
+import json
+import threading
+import time
 import yaml
 import requests
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
 from models.database import db, Configuration
+from models.openrouter_client import http_session, decode_json, OPENROUTER_MODELS_URL
+
+# Prefer the libyaml C loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# In-process cache of API keys, kept in sync by set_api_key()
+_KEY_CACHE: Dict[str, Optional[str]] = {}
+_KEY_CACHE_LOCK = threading.Lock()
+
+# How long a cached copy of OpenRouter's model list stays valid (seconds)
+OPENROUTER_MODELS_CACHE_TTL = 24 * 60 * 60
+
+
+def _models_config_path() -> str:
+    """Return the absolute path to config/models.yaml."""
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        'config',
+        'models.yaml'
+    )
 
 
 def load_models_config() -> List[Dict[str, str]]:
     """
     Load model configuration from config/models.yaml.
 
+    The parsed file is cached and only re-read when its modification time changes.
+
     Returns:
         List of model dictionaries with keys: id, display_name, vendor
 
@@ -21,30 +50,69 @@ def load_models_config() -> List[Dict[str, str]]:
         FileNotFoundError: If models.yaml doesn't exist
         yaml.YAMLError: If YAML is malformed
     """
-    config_path = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-        'config',
-        'models.yaml'
-    )
+    config_path = _models_config_path()
+    mtime = os.path.getmtime(config_path)
+
+    return _load_models_config_cached(config_path, mtime)
+
 
+@lru_cache(maxsize=4)
+def _load_models_config_cached(config_path: str, mtime: float) -> List[Dict[str, str]]:
+    """Parse models.yaml; cached per (path, mtime) by load_models_config()."""
     with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+        config = yaml.load(f, Loader=_YamlLoader)
 
     return config.get('models', [])
 
 
+def load_models_lookup() -> Dict[str, Dict[str, str]]:
+    """
+    Return the configured models keyed by model ID.
+
+    Built from load_models_config() and cached alongside it, so the dict is only
+    rebuilt when models.yaml changes.
+
+    Returns:
+        Dict mapping model ID to its model dictionary
+
+    Raises:
+        FileNotFoundError: If models.yaml doesn't exist
+        yaml.YAMLError: If YAML is malformed
+    """
+    config_path = _models_config_path()
+    mtime = os.path.getmtime(config_path)
+
+    return _load_models_lookup_cached(config_path, mtime)
+
+
+@lru_cache(maxsize=4)
+def _load_models_lookup_cached(config_path: str, mtime: float) -> Dict[str, Dict[str, str]]:
+    """Index models.yaml by model ID; cached per (path, mtime) by load_models_lookup()."""
+    return {model['id']: model for model in _load_models_config_cached(config_path, mtime)}
+
+
 def get_api_key(key_name: str) -> Optional[str]:
     """
     Retrieve an API key from the Configuration table.
 
+    Values are cached in-process after the first lookup.
+
     Args:
         key_name: Name of the API key (e.g., "openrouter", "0din_ai")
 
     Returns:
         API key value if found, None otherwise
     """
+    if key_name in _KEY_CACHE:
+        return _KEY_CACHE[key_name]
+
     config_entry = Configuration.query.filter_by(key=key_name).first()
-    return config_entry.value if config_entry else None
+    value = config_entry.value if config_entry else None
+
+    with _KEY_CACHE_LOCK:
+        _KEY_CACHE[key_name] = value
+
+    return value
 
 
 def set_api_key(key_name: str, value: str) -> None:
@@ -67,10 +135,42 @@ def set_api_key(key_name: str, value: str) -> None:
 
     db.session.commit()
 
+    with _KEY_CACHE_LOCK:
+        _KEY_CACHE[key_name] = value
+
+
+def _read_openrouter_models_cache(cache_path: str, max_age: float) -> Optional[Set[str]]:
+    """Return cached OpenRouter model IDs if the cache exists and is fresh, else None."""
+    try:
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+
+        if time.time() - cache['fetched_at'] > max_age:
+            return None
+
+        return set(cache['available_ids'])
+
+    except (OSError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _write_openrouter_models_cache(cache_path: str, available_ids: Set[str]) -> None:
+    """Persist OpenRouter model IDs to disk; failures are ignored since the cache is optional."""
+    tmp_path = f"{cache_path}.tmp"
+
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump({'fetched_at': time.time(), 'available_ids': sorted(available_ids)}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
 
 def validate_models_against_openrouter(
     api_key: str,
-    configured_models: List[Dict[str, str]]
+    configured_models: List[Dict[str, str]],
+    cache_path: Optional[str] = None,
+    max_age: float = OPENROUTER_MODELS_CACHE_TTL
 ) -> Tuple[List[str], Optional[str]]:
     """
     Validate configured models against OpenRouter's API.
@@ -78,43 +178,51 @@ def validate_models_against_openrouter(
     Args:
         api_key: OpenRouter API key
         configured_models: List of model dicts from load_models_config()
+        cache_path: Optional JSON file caching OpenRouter's model list between runs
+        max_age: Maximum cache age in seconds before the list is fetched again
 
     Returns:
         Tuple of (unavailable_models, error_message)
         - unavailable_models: List of model IDs that are configured but not available
         - error_message: Error description if API call failed, None otherwise
     """
-    try:
-        # Query OpenRouter /models endpoint
-        response = requests.get(
-            'https://openrouter.ai/api/v1/models',
-            headers={'Authorization': f'Bearer {api_key}'},
-            timeout=10
-        )
+    available_model_ids = _read_openrouter_models_cache(cache_path, max_age) if cache_path else None
 
-        if response.status_code != 200:
-            return [], f"OpenRouter API returned status {response.status_code}"
+    if available_model_ids is None:
+        try:
+            # Query OpenRouter /models endpoint
+            response = http_session.get(
+                OPENROUTER_MODELS_URL,
+                headers={'Authorization': f'Bearer {api_key}'},
+                timeout=10
+            )
 
-        # Extract available model IDs
-        available_models_data = response.json()
-        available_model_ids = {model['id'] for model in available_models_data.get('data', [])}
+            if response.status_code != 200:
+                return [], f"OpenRouter API returned status {response.status_code}"
 
-        # Check which configured models are unavailable
-        configured_model_ids = {model['id'] for model in configured_models}
-        unavailable = [
-            model_id for model_id in configured_model_ids
-            if model_id not in available_model_ids
-        ]
+            # Extract available model IDs
+            available_models_data = decode_json(response.content)
+            available_model_ids = {model['id'] for model in available_models_data.get('data', [])}
 
-        return unavailable, None
+        except requests.RequestException as e:
+            return [], f"Failed to connect to OpenRouter API: {str(e)}"
+        except (KeyError, ValueError) as e:
+            return [], f"Failed to parse OpenRouter API response: {str(e)}"
 
-    except requests.RequestException as e:
-        return [], f"Failed to connect to OpenRouter API: {str(e)}"
-    except (KeyError, ValueError) as e:
-        return [], f"Failed to parse OpenRouter API response: {str(e)}"
+        if cache_path:
+            _write_openrouter_models_cache(cache_path, available_model_ids)
 
+    # Check which configured models are unavailable
+    configured_model_ids = {model['id'] for model in configured_models}
+    unavailable = [
+        model_id for model_id in configured_model_ids
+        if model_id not in available_model_ids
+    ]
 
-def mask_api_key(api_key: str) -> str:
+    return unavailable, None
+
+
+def mask_api_key(api_key: Optional[str]) -> Optional[str]:
     """
     Mask an API key for display purposes.
 
@@ -122,12 +230,15 @@ def mask_api_key(api_key: str) -> str:
     Example: "sk-abc123def456" -> "sk-***456"
 
     Args:
-        api_key: Full API key string
+        api_key: Full API key string, or None if no key is configured
 
     Returns:
-        Masked version of the key
+        Masked version of the key, or None if no key was given
     """
-    if not api_key or len(api_key) < 8:
+    if not api_key:
+        return None
+
+    if len(api_key) < 8:
         return "***"
 
     return f"{api_key[:3]}***{api_key[-3:]}"
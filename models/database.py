@@ -33,6 +33,13 @@ class PromptVersion(db.Model):
     Supports versioning with rollback capability.
     """
     __tablename__ = 'prompt_versions'
+    __table_args__ = (
+        db.Index('ix_pv_session_current', 'session_id', 'is_current_version'),
+        db.Index('ix_pv_session_created', 'session_id', 'created_at'),
+        # At most one current version per session
+        db.Index('ix_pv_one_current', 'session_id', unique=True,
+                 sqlite_where=db.text('is_current_version = 1')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('test_sessions.id'), nullable=False)
@@ -55,6 +62,9 @@ class TestResult(db.Model):
     Stores raw response, JEF scores, and pass/fail status.
     """
     __tablename__ = 'test_results'
+    __table_args__ = (
+        db.Index('ix_tr_version_created', 'version_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     version_id = db.Column(db.Integer, db.ForeignKey('prompt_versions.id'), nullable=False)
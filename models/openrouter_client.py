@@ -5,6 +5,104 @@ Handles communication with OpenRouter API for testing prompts against LLM models
 
 import requests
 import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# orjson is optional; when installed it encodes and decodes large payloads much faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Longest server-requested Retry-After (and backoff) waited before a retry, in seconds
+MAX_RETRY_WAIT = 10
+
+# OpenRouter model list endpoint, used to validate the configured models
+OPENROUTER_MODELS_URL = 'https://openrouter.ai/api/v1/models'
+
+
+class _CappedRetry(Retry):
+    """Retry that waits at most MAX_RETRY_WAIT seconds for a Retry-After header."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_WAIT)
+
+
+# Shared HTTP session so TCP/TLS connections to OpenRouter are reused across calls
+# (requests already negotiates gzip via its default Accept-Encoding header)
+http_session = requests.Session()
+http_session.headers.update({"Content-Type": "application/json"})
+# 429/5xx responses to the chat POST are retried with exponential backoff, honouring
+# Retry-After; read and other post-send errors are not retried, since the completion
+# may already be running (and billed). Once retries run out the last response is
+# returned so callers still see the HTTP status
+_adapter = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=_CappedRetry(
+        total=5,
+        read=0,
+        other=0,
+        backoff_factor=1.0,
+        backoff_max=MAX_RETRY_WAIT,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["POST"],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+)
+http_session.mount('http://', _adapter)
+http_session.mount('https://', _adapter)
+# The model list GET is idempotent, so it keeps its own shorter retry policy
+# including read errors
+_models_adapter = HTTPAdapter(
+    max_retries=_CappedRetry(
+        total=3,
+        backoff_factor=0.5,
+        backoff_max=MAX_RETRY_WAIT,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+        raise_on_status=False
+    )
+)
+http_session.mount(OPENROUTER_MODELS_URL, _models_adapter)
+
+
+def decode_json(content):
+    """
+    Decode a JSON response body, using orjson when it is available.
+
+    Args:
+        content (bytes): Raw response body
+
+    Returns:
+        The decoded JSON value
+
+    Raises:
+        ValueError: If the body is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def encode_json(value):
+    """
+    Encode a value as a JSON request body, using orjson when it is available.
+
+    Args:
+        value: JSON-serializable value
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value).encode('utf-8')
 
 
 def test_prompt_on_model(api_key, model_id, prompt, temperature=0.7, timeout=60):
@@ -27,8 +125,7 @@ def test_prompt_on_model(api_key, model_id, prompt, temperature=0.7, timeout=60)
     endpoint = "https://openrouter.ai/api/v1/chat/completions"
 
     headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
+        "Authorization": f"Bearer {api_key}"
     }
 
     # OpenRouter uses OpenAI-compatible format
@@ -44,10 +141,10 @@ def test_prompt_on_model(api_key, model_id, prompt, temperature=0.7, timeout=60)
     }
 
     try:
-        response = requests.post(
+        response = http_session.post(
             endpoint,
             headers=headers,
-            json=payload,
+            data=encode_json(payload),
             timeout=timeout
         )
 
@@ -55,7 +152,7 @@ def test_prompt_on_model(api_key, model_id, prompt, temperature=0.7, timeout=60)
         response.raise_for_status()
 
         # Parse JSON response
-        response_data = response.json()
+        response_data = decode_json(response.content)
 
         # Extract message content from OpenAI-compatible response format
         # Response format: {"choices": [{"message": {"content": "..."}}]}
@@ -3,6 +3,8 @@ Summary Statistics Calculator
 Calculate aggregate statistics for test results.
 """
 
+from models.database import db, TestResult
+
 
 def calculate_summary(test_results):
     """
@@ -26,21 +28,47 @@ def calculate_summary(test_results):
         - If total_count is 0, all percentages are 0.0
         - success + failed + error = total (100%)
     """
-    # Initialize counts
+    # Count results by status in a single pass; failures are whatever remains
     total_count = len(test_results)
-    success_count = 0
-    failed_count = 0
     error_count = 0
+    success_count = 0
 
-    # Count results by status
     for result in test_results:
         if result.error_status:
             error_count += 1
         elif result.overall_success:
             success_count += 1
-        else:
-            failed_count += 1
 
+    failed_count = total_count - error_count - success_count
+
+    return _build_summary(total_count, success_count, failed_count, error_count)
+
+
+def calculate_summary_db(version_id):
+    """
+    Calculate summary statistics for a prompt version with a single SQL aggregate.
+
+    Equivalent to calculate_summary() over the version's TestResult rows, but
+    counts them in the database instead of loading every row into Python.
+
+    Args:
+        version_id (int): PromptVersion ID whose results should be summarized
+
+    Returns:
+        dict: Same structure as calculate_summary()
+    """
+    total_count, success_count, failed_count, error_count = db.session.query(
+        db.func.count(),
+        db.func.count().filter(db.and_(~TestResult.error_status, TestResult.overall_success)),
+        db.func.count().filter(db.and_(~TestResult.error_status, ~TestResult.overall_success)),
+        db.func.count().filter(TestResult.error_status)
+    ).filter(TestResult.version_id == version_id).one()
+
+    return _build_summary(total_count, success_count, failed_count, error_count)
+
+
+def _build_summary(total_count, success_count, failed_count, error_count):
+    """Build the summary dict from raw counts, adding rounded percentages."""
     # Calculate percentages
     if total_count > 0:
         success_percentage = (success_count / total_count) * 100
@@ -1,18 +1,87 @@
 """
-Sequential Test Runner
-Executes prompts against multiple LLM models with rate limiting.
+Concurrent Test Runner
+Executes prompts against multiple LLM models in parallel with rate limiting.
 """
 
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from models.database import db, TestResult, PromptVersion
 from models import openrouter_client
-from models.config import load_models_config
+from models.config import load_models_lookup
 from models import jef_scorer
 
 
-def run_tests_sequential(version_id, model_ids, temperature, api_key, prompt_text):
+# Maximum number of OpenRouter requests in flight at once
+MAX_CONCURRENT_REQUESTS = 8
+
+# Minimum spacing between the start of consecutive OpenRouter requests (seconds)
+REQUEST_INTERVAL = 5
+
+
+class RateLimiter:
+    """
+    Spaces out calls so that consecutive wait() calls return at least
+    `interval` seconds apart, across all threads sharing the limiter.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until this caller's reserved start slot arrives."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Shared by every test run in the process, so concurrent runs (e.g. two browser
+# tabs) still respect the request spacing as a whole
+_rate_limiter = RateLimiter(REQUEST_INTERVAL)
+
+
+def _query_and_score(rate_limiter, api_key, model_id, prompt_text, temperature,
+                     reference_text, model_name, vendor):
+    """
+    Call one model and score its response (runs on a worker thread).
+
+    Returns:
+        tuple: (response_text, scores, error_message); error_message is None on success
     """
-    Run tests sequentially against multiple models with rate limiting.
+    rate_limiter.wait()
+
+    try:
+        # Call OpenRouter API
+        response_text = openrouter_client.test_prompt_on_model(
+            api_key=api_key,
+            model_id=model_id,
+            prompt=prompt_text,
+            temperature=temperature
+        )
+
+        # Score the response using JEF
+        scores = jef_scorer.score_response(
+            response_text=response_text,
+            reference_text=reference_text,
+            model_name=model_name,
+            vendor=vendor
+        )
+
+        return response_text, scores, None
+
+    except Exception as e:
+        return None, None, str(e)
+
+
+def run_tests_concurrent(version_id, model_ids, temperature, api_key, prompt_text):
+    """
+    Run tests concurrently against multiple models with rate limiting.
 
     Args:
         version_id (int): PromptVersion ID to associate results with
@@ -22,50 +91,64 @@ def run_tests_sequential(version_id, model_ids, temperature, api_key, prompt_tex
         prompt_text (str): The prompt to test
 
     Returns:
-        list: List of created TestResult IDs
+        list: List of created TestResult IDs, in the same order as model_ids
 
     Note:
         - Creates TestResult records for each model (success or failure)
-        - Waits 5 seconds between each API call for rate limiting
+        - Up to MAX_CONCURRENT_REQUESTS API calls are in flight at once
+        - Call start times are spaced REQUEST_INTERVAL seconds apart for rate limiting,
+          across all runs in the process; scoring overlaps the wait for the next slot
         - Continues testing even if some models fail
         - Scores and pass fields are calculated using 0din-JEF library
         - Excluded models (Grok, Mistral, Command R) have NULL scores
+        - All results are written in one commit on the calling thread
     """
-    # Load model configuration to get display names and vendors
-    configured_models = load_models_config()
-    model_lookup = {model['id']: model for model in configured_models}
-
-    # Get reference text from PromptVersion for copyright scoring
-    prompt_version = PromptVersion.query.get(version_id)
-    reference_text = prompt_version.reference_text if prompt_version else None
-
-    result_ids = []
-    total_models = len(model_ids)
-
-    for index, model_id in enumerate(model_ids):
-        # Get model details from configuration
+    # Load model configuration to get display names and vendors (cached)
+    model_lookup = load_models_lookup()
+
+    # Get reference text from PromptVersion for copyright scoring (column only,
+    # without loading the version's prompt text)
+    reference_text = db.session.query(PromptVersion.reference_text)\
+        .filter_by(id=version_id)\
+        .scalar()
+
+    # Get model details from configuration
+    model_details = []
+    for model_id in model_ids:
         model_info = model_lookup.get(model_id, {})
-        model_name = model_info.get('display_name', model_id)
-        vendor = model_info.get('vendor', 'Unknown')
-
-        try:
-            # Call OpenRouter API
-            response_text = openrouter_client.test_prompt_on_model(
-                api_key=api_key,
-                model_id=model_id,
-                prompt=prompt_text,
-                temperature=temperature
+        model_details.append((
+            model_id,
+            model_info.get('display_name', model_id),
+            model_info.get('vendor', 'Unknown')
+        ))
+
+    max_workers = max(1, min(MAX_CONCURRENT_REQUESTS, len(model_details)))
+
+    test_results = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _query_and_score,
+                _rate_limiter, api_key, model_id, prompt_text, temperature,
+                reference_text, model_name, vendor
             )
+            for model_id, model_name, vendor in model_details
+        ]
+
+        for (model_id, model_name, vendor), future in zip(model_details, futures):
+            response_text, scores, error_message = future.result()
+
+            if error_message is None:
+                # Scores and pass flags from JEF (pass flags are stored as False when skipped)
+                jef_fields = {'overall_success': scores['overall_success']}
+                for name in jef_scorer.TEST_NAMES:
+                    jef_fields[f'{name}_score'] = scores[f'{name}_score']
+                    jef_fields[f'{name}_pass'] = bool(scores[f'{name}_pass'])
+            else:
+                # Errors keep the column defaults: NULL scores, False pass flags
+                jef_fields = {}
 
-            # Score the response using JEF
-            scores = jef_scorer.score_response(
-                response_text=response_text,
-                reference_text=reference_text,
-                model_name=model_name,
-                vendor=vendor
-            )
-
-            # Create successful TestResult with scores
             test_result = TestResult(
                 version_id=version_id,
                 model_id=model_id,
@@ -73,55 +156,15 @@ def run_tests_sequential(version_id, model_ids, temperature, api_key, prompt_tex
                 vendor=vendor,
                 temperature=temperature,
                 response_text=response_text,
-                error_status=False,
-                error_message=None,
-                # Scores from JEF
-                tiananmen_score=scores['tiananmen_score'],
-                nerve_agent_score=scores['nerve_agent_score'],
-                meth_score=scores['meth_score'],
-                harry_potter_score=scores['harry_potter_score'],
-                copyrights_score=scores['copyrights_score'],
-                # Pass flags from JEF
-                tiananmen_pass=scores['tiananmen_pass'] if scores['tiananmen_pass'] is not None else False,
-                nerve_agent_pass=scores['nerve_agent_pass'] if scores['nerve_agent_pass'] is not None else False,
-                meth_pass=scores['meth_pass'] if scores['meth_pass'] is not None else False,
-                harry_potter_pass=scores['harry_potter_pass'] if scores['harry_potter_pass'] is not None else False,
-                copyrights_pass=scores['copyrights_pass'] if scores['copyrights_pass'] is not None else False,
-                overall_success=scores['overall_success']
-            )
-
-        except Exception as e:
-            # Create error TestResult
-            test_result = TestResult(
-                version_id=version_id,
-                model_id=model_id,
-                model_name=model_name,
-                vendor=vendor,
-                temperature=temperature,
-                response_text=None,
-                error_status=True,
-                error_message=str(e),
-                # Scores and pass flags remain NULL/False for errors
-                tiananmen_score=None,
-                nerve_agent_score=None,
-                meth_score=None,
-                harry_potter_score=None,
-                copyrights_score=None,
-                tiananmen_pass=False,
-                nerve_agent_pass=False,
-                meth_pass=False,
-                harry_potter_pass=False,
-                copyrights_pass=False,
-                overall_success=False
+                error_status=error_message is not None,
+                error_message=error_message,
+                **jef_fields
             )
 
-        # Save to database
-        db.session.add(test_result)
-        db.session.commit()
-        result_ids.append(test_result.id)
+            test_results.append(test_result)
 
-        # Rate limiting: sleep 5 seconds between calls (except after last one)
-        if index < total_models - 1:
-            time.sleep(5)
+    # Save all results to database in a single commit
+    db.session.add_all(test_results)
+    db.session.commit()
 
-    return result_ids
+    return [test_result.id for test_result in test_results]
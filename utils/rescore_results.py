@@ -4,11 +4,31 @@ Re-scoring Utility Script
 Re-run JEF scoring on existing TestResult records.
 
 Usage:
-    python utils/rescore_results.py [--all] [--result-id ID]
+    python utils/rescore_results.py [--all] [--result-id ID ...] [--ids-file PATH]
+                                    [--retry-from PATH] [--since DATE] [--model NAME]
+                                    [--batch-size N] [--workers N] [--dry-run]
+                                    [--failures-file PATH] [--no-cache]
+                                    [--clear-cache] [--verbose]
 
 Options:
-    --all           Re-score all test results with response_text
-    --result-id ID  Re-score a specific test result by ID
+    --all             Re-score all test results with response_text
+    --result-id ID    Re-score a specific test result by ID (repeatable)
+    --ids-file PATH   Re-score the test result IDs listed in a file, one per line
+    --retry-from PATH Re-score the test results listed in a failures CSV
+    --since DATE      Only re-score results created on or after DATE (ISO format)
+    --model NAME      Only re-score results from this model (ID or display name)
+    --batch-size N    Results loaded, re-scored and committed together
+    --workers N       Worker processes used for scoring
+    --dry-run         Report how many results would be re-scored, without changes
+    --failures-file PATH
+                      Where to write the IDs and errors of results that failed
+                      (default: rescore_failures.csv)
+    --no-cache        Score every response, ignoring the on-disk score cache
+    --clear-cache     Delete the on-disk score cache first (not with --dry-run)
+    --verbose         Log every re-scored result, not just progress
+
+Selection options (--result-id, --ids-file, --retry-from, --since, --model)
+combine, so only results matching all of them are re-scored.
 
 This script is useful for:
 - Testing JEF integration
@@ -17,129 +37,465 @@ This script is useful for:
 - Backfilling scores for old test results
 """
 
+import argparse
+import csv
+import logging
+import multiprocessing
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
 
 # Add project root to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models.database import db, TestResult, PromptVersion
 from models import jef_scorer
-from app import app
+from utils import score_cache
 
 
-def rescore_result(result):
+# Default number of results loaded, re-scored and committed together
+BATCH_SIZE = 500
+
+# Default number of worker processes used to run JEF scoring in parallel
+MAX_WORKERS = os.cpu_count() or 1
+
+# TestResult score and pass flag columns written by rescoring
+SCORE_COLUMNS = tuple(f'{name}_score' for name in jef_scorer.TEST_NAMES)
+PASS_COLUMNS = tuple(f'{name}_pass' for name in jef_scorer.TEST_NAMES)
+
+# Default CSV file listing results that failed to re-score, for --retry-from
+FAILURES_FILE = 'rescore_failures.csv'
+
+# Scores closer than this are treated as unchanged
+SCORE_TOLERANCE = 1e-9
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_scores(cache_key, scores, row, reference_text):
+    """Store scores in the on-disk cache unless a JEF scorer failed."""
+    if score_cache.is_complete(scores, row.response_text, reference_text,
+                               row.model_name, row.vendor):
+        score_cache.put(cache_key, scores)
+
+
+def score_mapping(result_id, scores):
     """
-    Re-score a single TestResult.
+    Build the TestResult update mapping for a result's new scores.
 
     Args:
-        result (TestResult): The test result to re-score
+        result_id (int): TestResult ID
+        scores (dict): Scores returned by jef_scorer.score_response
 
     Returns:
-        bool: True if successful, False if error
+        dict: Primary key and score columns, for bulk_update_mappings
     """
-    if not result.response_text:
-        print(f"  Result {result.id}: No response text, skipping")
-        return False
+    return {
+        'id': result_id,
+        'tiananmen_score': scores['tiananmen_score'],
+        'nerve_agent_score': scores['nerve_agent_score'],
+        'meth_score': scores['meth_score'],
+        'harry_potter_score': scores['harry_potter_score'],
+        'copyrights_score': scores['copyrights_score'],
+        'tiananmen_pass': scores['tiananmen_pass'] if scores['tiananmen_pass'] is not None else False,
+        'nerve_agent_pass': scores['nerve_agent_pass'] if scores['nerve_agent_pass'] is not None else False,
+        'meth_pass': scores['meth_pass'] if scores['meth_pass'] is not None else False,
+        'harry_potter_pass': scores['harry_potter_pass'] if scores['harry_potter_pass'] is not None else False,
+        'copyrights_pass': scores['copyrights_pass'] if scores['copyrights_pass'] is not None else False,
+        'overall_success': scores['overall_success']
+    }
+
+
+def scores_unchanged(row, mapping):
+    """
+    Check whether a result already holds the scores in a mapping.
 
-    if result.error_status:
-        print(f"  Result {result.id}: Has error status, skipping")
-        return False
+    Args:
+        row: Result row with the score columns loaded
+        mapping (dict): Dict from score_mapping()
 
-    # Get reference text from PromptVersion
-    prompt_version = PromptVersion.query.get(result.version_id)
-    reference_text = prompt_version.reference_text if prompt_version else None
+    Returns:
+        bool: True if writing the mapping would not change anything
+    """
+    for column, value in mapping.items():
+        current = getattr(row, column)
+        if isinstance(value, float) and isinstance(current, float):
+            if abs(value - current) > SCORE_TOLERANCE:
+                return False
+        elif value != current:
+            return False
+    return True
 
-    try:
-        # Score the response
-        scores = jef_scorer.score_response(
-            response_text=result.response_text,
-            reference_text=reference_text,
-            model_name=result.model_name,
-            vendor=result.vendor
-        )
 
-        # Update the result
-        result.tiananmen_score = scores['tiananmen_score']
-        result.nerve_agent_score = scores['nerve_agent_score']
-        result.meth_score = scores['meth_score']
-        result.harry_potter_score = scores['harry_potter_score']
-        result.copyrights_score = scores['copyrights_score']
+def save_batch(mappings):
+    """
+    Write a batch of score mappings in one commit, falling back to one commit per result.
 
-        result.tiananmen_pass = scores['tiananmen_pass'] if scores['tiananmen_pass'] is not None else False
-        result.nerve_agent_pass = scores['nerve_agent_pass'] if scores['nerve_agent_pass'] is not None else False
-        result.meth_pass = scores['meth_pass'] if scores['meth_pass'] is not None else False
-        result.harry_potter_pass = scores['harry_potter_pass'] if scores['harry_potter_pass'] is not None else False
-        result.copyrights_pass = scores['copyrights_pass'] if scores['copyrights_pass'] is not None else False
+    If the batch commit fails, the session is rolled back and each mapping is
+    written and committed on its own, so one bad row only loses itself.
 
-        result.overall_success = scores['overall_success']
+    Args:
+        mappings (list): Dicts from score_mapping()
 
+    Returns:
+        list: (result ID, error message) for each result that could not be saved
+    """
+    try:
+        db.session.bulk_update_mappings(TestResult, mappings)
         db.session.commit()
-
-        print(f"  Result {result.id}: Re-scored successfully (overall_success={scores['overall_success']})")
-        return True
-
+        return []
     except Exception as e:
-        print(f"  Result {result.id}: Error during re-scoring: {str(e)}")
+        logger.warning(f"  Batch commit failed ({str(e)}), retrying {len(mappings)} results one at a time")
         db.session.rollback()
-        return False
 
+    failures = []
+    for mapping in mappings:
+        try:
+            db.session.bulk_update_mappings(TestResult, [mapping])
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"  Result {mapping['id']}: Error saving scores: {str(e)}")
+            db.session.rollback()
+            failures.append((mapping['id'], f"Error saving scores: {type(e).__name__}: {e}"))
 
-def rescore_all():
-    """Re-score all test results with response_text."""
-    print("Re-scoring all test results with response_text...")
+    return failures
 
-    # Query all results with response_text
-    results = TestResult.query.filter(
-        TestResult.response_text.isnot(None),
-        TestResult.error_status == False
-    ).all()
 
-    print(f"Found {len(results)} results to re-score\n")
+def write_failures(path, failures):
+    """
+    Write failed results to a CSV file with 'id' and 'error' columns.
+
+    Args:
+        path (str): Path of the CSV file to write
+        failures (list): (result ID, error message) pairs
+    """
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'error'])
+        writer.writerows(failures)
 
-    success_count = 0
-    for result in results:
-        if rescore_result(result):
-            success_count += 1
 
-    print(f"\nRe-scoring complete: {success_count}/{len(results)} successful")
+def read_failures(path):
+    """
+    Read the result IDs from a failures CSV written by write_failures().
 
+    Args:
+        path (str): Path of the CSV file
 
-def rescore_by_id(result_id):
-    """Re-score a specific test result by ID."""
-    print(f"Re-scoring test result {result_id}...")
+    Returns:
+        list: Test result IDs
+    """
+    with open(path, newline='') as f:
+        return [int(row['id']) for row in csv.DictReader(f)]
 
-    result = TestResult.query.get(result_id)
 
-    if not result:
-        print(f"Error: Test result {result_id} not found")
-        return
+def _scoring_pool(workers):
+    """Start the worker process pool used to run JEF scoring."""
+    # Workers are spawned rather than forked: the Flask app has background threads
+    # running (optimize timer, model validation), and forking a multi-threaded
+    # process can deadlock. Each worker warms up the JEF scorers once when it starts
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=jef_scorer.warmup
+    )
+
+
+def rescore_filtered(filters=(), use_cache=True, batch_size=BATCH_SIZE,
+                     workers=MAX_WORKERS, dry_run=False, failures_path=FAILURES_FILE):
+    """
+    Re-score the test results with response_text that match the given filters.
+
+    Reads only the columns needed for scoring and writes the new scores back
+    with bulk_update_mappings, without loading TestResult instances.
 
-    if rescore_result(result):
-        print("\nRe-scoring complete")
+    Args:
+        filters (tuple): Extra SQLAlchemy criteria on TestResult selecting the results
+        use_cache (bool): Whether to read and write the on-disk score cache
+        batch_size (int): Results loaded, re-scored and committed together
+        workers (int): Worker processes used for scoring
+        dry_run (bool): Only report how many results would be re-scored
+        failures_path (str): CSV file written with the results that failed, if any
+    """
+    logger.info("Re-scoring test results with response_text...")
+
+    response_length = db.func.length(TestResult.response_text)
+    filters = (
+        TestResult.response_text.isnot(None),
+        TestResult.error_status == False,
+        *filters
+    )
+
+    # Responses too short to score (see jef_scorer.MIN_RESPONSE_LENGTH) would only
+    # get NULL scores back, so set those directly without fetching the rows,
+    # skipping rows that are already unscored
+    short_query = TestResult.query.filter(
+        *filters,
+        response_length > 0,
+        response_length < jef_scorer.MIN_RESPONSE_LENGTH,
+        db.or_(
+            TestResult.overall_success == True,
+            *(getattr(TestResult, column).isnot(None) for column in SCORE_COLUMNS),
+            *(getattr(TestResult, column) == True for column in PASS_COLUMNS)
+        )
+    )
+    if dry_run:
+        short_count = short_query.count()
+        logger.info(f"Would clear scores of {short_count} results too short to score")
     else:
-        print("\nRe-scoring failed")
+        unscored_fields = {'overall_success': False}
+        unscored_fields.update(dict.fromkeys(SCORE_COLUMNS, None))
+        unscored_fields.update(dict.fromkeys(PASS_COLUMNS, False))
+        short_count = short_query.update(unscored_fields, synchronize_session=False)
+        db.session.commit()
+        logger.info(f"Cleared scores of {short_count} results too short to score")
+
+    # Query the remaining results; reference text is kept per PromptVersion
+    # rather than joined onto every row
+    query = db.session.query(
+        TestResult.id,
+        TestResult.version_id,
+        TestResult.response_text,
+        TestResult.model_name,
+        TestResult.vendor,
+        TestResult.overall_success,
+        *(getattr(TestResult, column) for column in SCORE_COLUMNS + PASS_COLUMNS)
+    ).filter(
+        *filters,
+        response_length >= jef_scorer.MIN_RESPONSE_LENGTH
+    )
+
+    total = query.count()
+    if dry_run:
+        logger.info(f"Would re-score {total} results")
+        return
+
+    # Reference texts of every PromptVersion with results to re-score, in one query
+    reference_texts = dict(
+        db.session.query(PromptVersion.id, PromptVersion.reference_text)
+        .filter(PromptVersion.id.in_(query.with_entities(TestResult.version_id)))
+        .all()
+    )
+    logger.info(f"Found {total} results to re-score")
+
+    # Walk the results in id order one batch_size page at a time, committing each
+    # page, so only one page of response texts is held in memory at once
+    success_count = 0
+    unchanged_count = 0
+    failures = []
+    processed_count = 0
+    last_id = 0
+    executor = _scoring_pool(workers)
+    try:
+        while True:
+            rows = query.filter(TestResult.id > last_id)\
+                .order_by(TestResult.id)\
+                .limit(batch_size)\
+                .all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            # Identical responses (e.g. stock refusals) share a key and are scored
+            # once per page; scoring is CPU-bound, so the page's cache misses are
+            # scored across worker processes and collected here in the main process
+            row_keys = []
+            pending = {}
+            for row in rows:
+                reference_text = reference_texts.get(row.version_id)
+                cache_key = score_cache.cache_key(
+                    row.response_text, reference_text, row.model_name, row.vendor
+                )
+                row_keys.append((row, cache_key))
+                if cache_key in pending:
+                    continue
+
+                scores = score_cache.get(cache_key) if use_cache else None
+                future = None
+                if scores is None:
+                    args = (row.response_text, reference_text, row.model_name, row.vendor)
+                    try:
+                        future = executor.submit(jef_scorer.score_response, *args)
+                    except BrokenProcessPool:
+                        # A worker died (e.g. OOM-killed) and took the pool with it; the
+                        # results it had in flight fail below, the rest use a new pool
+                        logger.warning("  Scoring worker pool broke, starting a new one")
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        executor = _scoring_pool(workers)
+                        future = executor.submit(jef_scorer.score_response, *args)
+                pending[cache_key] = (row, reference_text, scores, future)
+
+            # Scores per key, or the exception raised while scoring it
+            scores_by_key = {}
+            for cache_key, (row, reference_text, scores, future) in pending.items():
+                if future is not None:
+                    try:
+                        scores = future.result()
+                    except Exception as e:
+                        scores = e
+                    else:
+                        if use_cache:
+                            _cache_scores(cache_key, scores, row, reference_text)
+                scores_by_key[cache_key] = scores
+
+            mappings = []
+            for row, cache_key in row_keys:
+                scores = scores_by_key[cache_key]
+                if isinstance(scores, Exception):
+                    logger.error(f"  Result {row.id}: Error during re-scoring: {str(scores)}")
+                    failures.append((row.id, f"Error during re-scoring: {type(scores).__name__}: {scores}"))
+                    continue
+
+                # Results whose scores did not change are not written back
+                mapping = score_mapping(row.id, scores)
+                if scores_unchanged(row, mapping):
+                    success_count += 1
+                    unchanged_count += 1
+                    logger.debug(f"  Result {row.id}: Re-scored, unchanged")
+                    continue
+
+                mappings.append(mapping)
+                logger.debug(f"  Result {row.id}: Re-scored successfully (overall_success={scores['overall_success']})")
+
+            if mappings:
+                save_failures = save_batch(mappings)
+                success_count += len(mappings) - len(save_failures)
+                failures += save_failures
+
+            # One progress line per page rather than one line per result
+            processed_count += len(rows)
+            logger.info(
+                f"  Processed {processed_count}/{total} results "
+                f"({success_count} re-scored, {unchanged_count} unchanged)"
+            )
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+        # Written even when the run is aborted, so the failures can still be retried
+        if failures:
+            write_failures(failures_path, failures)
+            logger.warning(
+                f"Wrote {len(failures)} failed results to {failures_path}; "
+                f"re-run them with --retry-from {failures_path}"
+            )
+
+    logger.info(
+        f"Re-scoring complete: {success_count}/{total} successful "
+        f"({unchanged_count} unchanged)"
+    )
+
+
+def positive_int(value):
+    """argparse type for options that must be a positive integer."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def read_ids_file(path):
+    """
+    Read test result IDs from a file, one per line.
+
+    Blank lines and lines starting with '#' are ignored.
+
+    Args:
+        path (str): Path to the IDs file
+
+    Returns:
+        list: Test result IDs
+    """
+    with open(path) as f:
+        return [int(line) for line in map(str.strip, f) if line and not line.startswith('#')]
+
+
+def build_parser():
+    """Build the command line parser."""
+    parser = argparse.ArgumentParser(
+        description="Re-run JEF scoring on existing TestResult records."
+    )
+    parser.add_argument('--all', action='store_true',
+                        help="Re-score all test results with response_text")
+    parser.add_argument('--result-id', type=int, action='append', default=[], metavar='ID',
+                        help="Re-score a specific test result by ID (repeatable)")
+    parser.add_argument('--ids-file', metavar='PATH',
+                        help="Re-score the test result IDs listed in a file, one per line")
+    parser.add_argument('--retry-from', metavar='PATH',
+                        help="Re-score the test results listed in a failures CSV")
+    parser.add_argument('--since', type=datetime.fromisoformat, metavar='DATE',
+                        help="Only re-score results created on or after DATE (ISO format)")
+    parser.add_argument('--model', metavar='NAME',
+                        help="Only re-score results from this model (ID or display name)")
+    parser.add_argument('--batch-size', type=positive_int, default=BATCH_SIZE, metavar='N',
+                        help=f"Results loaded, re-scored and committed together (default: {BATCH_SIZE})")
+    parser.add_argument('--workers', type=positive_int, default=MAX_WORKERS, metavar='N',
+                        help=f"Worker processes used for scoring (default: {MAX_WORKERS})")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Report how many results would be re-scored, without changes")
+    parser.add_argument('--failures-file', default=FAILURES_FILE, metavar='PATH',
+                        help=f"Where to write the IDs and errors of results that failed (default: {FAILURES_FILE})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Score every response, ignoring the on-disk score cache")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="Delete the on-disk score cache first (not with --dry-run)")
+    parser.add_argument('--verbose', action='store_true',
+                        help="Log every re-scored result, not just progress")
+    return parser
 
 
 def main():
     """Main entry point."""
-    if len(sys.argv) < 2:
-        print("Usage: python utils/rescore_results.py [--all] [--result-id ID]")
-        print("\nOptions:")
-        print("  --all           Re-score all test results with response_text")
-        print("  --result-id ID  Re-score a specific test result by ID")
-        sys.exit(1)
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.dry_run and args.clear_cache:
+        parser.error("--clear-cache cannot be used with --dry-run")
+
+    # Imported here rather than at module level so scoring worker processes,
+    # which import this module, do not start the Flask app
+    from app import app
+
+    # Only this script's own messages go to stdout; library loggers (urllib3,
+    # SQLAlchemy) are left unconfigured so they stay out of the progress output
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
+    logger.propagate = False
+
+    if args.clear_cache:
+        score_cache.clear()
+        logger.info(f"Cleared score cache at {score_cache.SCORE_CACHE_DIR}")
+
+    # Selection options narrow the results down; --all alone selects everything
+    filters = []
+    if args.result_id or args.ids_file or args.retry_from:
+        result_ids = list(args.result_id)
+        if args.ids_file:
+            result_ids += read_ids_file(args.ids_file)
+        if args.retry_from:
+            result_ids += read_failures(args.retry_from)
+        filters.append(TestResult.id.in_(result_ids))
+    if args.since:
+        filters.append(TestResult.created_at >= args.since)
+    if args.model:
+        filters.append(db.or_(TestResult.model_id == args.model, TestResult.model_name == args.model))
+
+    if not args.all and not filters:
+        if args.clear_cache:
+            return
+        parser.error("select results with --all, --result-id, --ids-file, --retry-from, --since or --model")
 
     with app.app_context():
-        if sys.argv[1] == '--all':
-            rescore_all()
-        elif sys.argv[1] == '--result-id' and len(sys.argv) >= 3:
-            result_id = int(sys.argv[2])
-            rescore_by_id(result_id)
-        else:
-            print("Error: Invalid arguments")
-            print("Usage: python utils/rescore_results.py [--all] [--result-id ID]")
-            sys.exit(1)
+        rescore_filtered(
+            filters=tuple(filters),
+            use_cache=not args.no_cache,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            dry_run=args.dry_run,
+            failures_path=args.failures_file
+        )
 
 
 if __name__ == '__main__':
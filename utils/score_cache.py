@@ -0,0 +1,127 @@
+"""
+On-Disk Score Cache
+Stores JEF score dicts from re-scoring runs, keyed by a hash of the scored inputs,
+the installed 0din-JEF version and this repo's scoring rules, so unchanged results
+are not scored again.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from importlib import metadata
+
+from models import jef_scorer
+
+
+# Cache directory; entries are sharded by the first two hex digits of their key
+SCORE_CACHE_DIR = os.getenv(
+    'SCORE_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'mjolnir', 'scores')
+)
+
+try:
+    SCORER_VERSION = metadata.version('0din-jef')
+except metadata.PackageNotFoundError:
+    SCORER_VERSION = 'unknown'
+
+
+def cache_key(response_text, reference_text, model_name, vendor):
+    """
+    Build the cache key for one set of score_response inputs.
+
+    Args:
+        response_text (str): The model's response
+        reference_text (str): Reference text for copyright tests, or None
+        model_name (str): Model display name
+        vendor (str): Model vendor
+
+    Returns:
+        str: Hex SHA-256 digest of the JEF version, scoring rules and the inputs
+    """
+    digest = hashlib.sha256()
+    parts = (SCORER_VERSION, jef_scorer.SCORING_FINGERPRINT,
+             response_text, reference_text, model_name, vendor)
+    for part in parts:
+        # Length-prefix each part so distinct inputs can never concatenate equally
+        encoded = (part or '').encode('utf-8')
+        digest.update(len(encoded).to_bytes(8, 'big'))
+        digest.update(encoded)
+        digest.update(b'\x01' if part is not None else b'\x00')
+    return digest.hexdigest()
+
+
+def _entry_path(key):
+    """Return the file path of a cache entry."""
+    return os.path.join(SCORE_CACHE_DIR, key[:2], f'{key}.json')
+
+
+def get(key):
+    """
+    Look up cached scores.
+
+    Args:
+        key (str): Key from cache_key()
+
+    Returns:
+        dict: The cached scores, or None if not cached (or unreadable)
+    """
+    try:
+        with open(_entry_path(key), 'rb') as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def put(key, scores):
+    """
+    Store scores, writing to a temporary file and renaming it into place so
+    readers never see a partial entry. Failures are ignored since the cache
+    is optional.
+
+    Args:
+        key (str): Key from cache_key()
+        scores (dict): Scores returned by jef_scorer.score_response
+    """
+    path = _entry_path(key)
+    tmp_path = None
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(scores, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def clear():
+    """Delete every cached entry."""
+    shutil.rmtree(SCORE_CACHE_DIR, ignore_errors=True)
+
+
+def is_complete(scores, response_text, reference_text, model_name, vendor):
+    """
+    Check that every applicable JEF scorer produced a score.
+
+    score_response leaves a score as None when its scorer fails;
+    such results are not cached, so the next run scores them again.
+
+    Returns:
+        bool: True if the scores are safe to cache
+    """
+    if jef_scorer.is_excluded_model(model_name, vendor):
+        return True
+    if not response_text or len(response_text) < jef_scorer.MIN_RESPONSE_LENGTH:
+        return True
+
+    names = jef_scorer.SUBSTANCE_TEST_NAMES
+    if reference_text:
+        names += jef_scorer.COPYRIGHT_TEST_NAMES
+    return all(scores[f'{name}_score'] is not None for name in names)